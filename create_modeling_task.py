@@ -9,7 +9,6 @@ Usages:
         python create_modeling_task.py -t context-dependent-same-type --generation --generation
 """
 
-import modeling.modeling_task as modeling_task
 from toolbox.parsers import standard_parser, add_annotations_arguments, add_task_arguments
 from toolbox.utils import to_class_name
 
@@ -29,6 +28,8 @@ def main():
 
     args = parse_arguments()
 
+    import modeling.modeling_task as modeling_task  # heavy import, done once the arguments are parsed
+
     task_name = to_class_name(args.task)
     task = getattr(modeling_task, task_name)(ranking_size=args.ranking_size,
                                              batch_size=args.batch_size,
@@ -38,6 +39,7 @@ def main():
                                              k_cross_validation=int(args.cross_validation) * args.k_cross_validation,
                                              valid_proportion=args.valid_proportion,
                                              test_proportion=args.test_proportion,
+                                             short_size=args.short_size,
                                              random_seed=args.random_seed,
                                              save=not args.no_save,
                                              silent=args.silent,
@@ -4,14 +4,16 @@ from database_creation.utils import Tuple, Wikipedia, Query, Annotation
 from numpy import split as np_split
 from numpy.random import seed, choice
 from time import time
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
-from collections import defaultdict
+from collections import defaultdict, deque
 from pickle import dump, load, PicklingError
 from pandas import DataFrame, read_csv
 from unidecode import unidecode
-from wikipedia import search, page, WikipediaException, DisambiguationError
+from wikipedia import search, page, set_rate_limiting, DisambiguationError, WikipediaException
+from requests.exceptions import RequestException
 from xml.etree.ElementTree import ParseError
-from itertools import chain, combinations
+from itertools import chain, combinations, islice
 from re import findall
 
 
@@ -147,19 +149,20 @@ class AnnotationTask:
         self.filter_no_query()
 
     @Verbose("Processing the wikipedia information...")
-    def process_wikipedia(self, load, file_name):
+    def process_wikipedia(self, load, file_name, workers):
         """
         Performs the processing of the wikipedia information of the database, or load it.
 
         Args:
             load: bool, if True, load an existing file, else, computes it.
             file_name: str, name of the wikipedia file to save or load; if None, deal with the standard files name.
+            workers: int, number of threads requesting wikipedia.
         """
 
         if load:
             self.load_attr_pkl(attribute_name='wikipedia', file_name=file_name, folder_name='wikipedia')
 
-        self.compute_wikipedia(load=load)
+        self.compute_wikipedia(load=load, workers=workers)
         self.save_attr_pkl(attribute_name='wikipedia', file_name=file_name, folder_name='wikipedia')
 
     @Verbose("Processing the aggregation queries...")
@@ -249,16 +252,17 @@ class AnnotationTask:
         self.wikipedia = out_wikipedia
 
     @Verbose("Solving manually the wikipedia issues...")
-    def correct_wiki(self, step, out_name):
+    def correct_wiki(self, steps, out_name):
         """
-        Run the manual correction of the wikipedia tricky cases.
+        Run the manual correction of the wikipedia tricky cases. Several steps can be performed in a single run, the
+        wikipedia file being saved only once, at the end.
 
         Args:
-            step: int, step of the correction to perform, between 1 and 4.
+            steps: tuple, steps of the correction to perform (int between 1 and 4), in order.
             out_name: str, name of the wikipedia file to save; if None, deal with the standard files name.
         """
 
-        self.correction(step=step)
+        self.correction(steps=steps)
         self.save_attr_pkl(attribute_name='wikipedia', file_name=out_name, folder_name='wikipedia')
 
     # endregion
@@ -426,46 +430,66 @@ class AnnotationTask:
         self.write_debug(field='articles', method='contexts')
 
     @Verbose("Computing the Wikipedia information...")
-    def compute_wikipedia(self, load):
+    def compute_wikipedia(self, load, workers):
         """
-        Compute the wikipedia information about the entities from self.tuples.
+        Compute the wikipedia information about the entities from self.tuples. The requests to wikipedia are
+        independent from one entity to another, so they are sent concurrently by several threads.
 
         Args:
             load: bool, if True, load an existing file.
+            workers: int, number of threads requesting wikipedia.
         """
 
         wikipedia = self.wikipedia if load else {'found': dict(), 'not_found': set()}
 
         self.print("Initial entries: %i found/%i not found." % (len(wikipedia['found']), len(wikipedia['not_found'])))
 
-        try:
-            count, size = 0, len(self.entities)
-            for name, entity in self.entities.items():
-                count = self.progression(count=count, modulo=self.modulo_entities, size=size, text='entity')
+        for name, entity in self.entities.items():
+            if name in wikipedia['found']:
+                entity.wiki = wikipedia['found'][name]
+            elif name in wikipedia['not_found']:
+                entity.wiki = Wikipedia()
+
+        to_request = [(name, entity) for name, entity in self.entities.items()
+                      if name not in wikipedia['found'] and name not in wikipedia['not_found']]
+
+        self.print("Entities to request: %i/%i." % (len(to_request), len(self.entities)))
+
+        # only a window of requests is submitted ahead of the results being processed, so that few requests are
+        # left to cancel if an error occurs
+        requests, pending = iter(to_request), deque()
+
+        # the requests of all the threads are spaced out so that wikipedia is not flooded
+        set_rate_limiting(True)
 
-                if not load:
-                    wiki = entity.get_wiki()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                for name, entity in islice(requests, 2 * workers):
+                    pending.append((name, entity, executor.submit(entity.get_wiki)))
+
+                count, size = 0, len(to_request)
+                while pending:
+                    name, entity, future = pending.popleft()
+                    for next_name, next_entity in islice(requests, 1):
+                        pending.append((next_name, next_entity, executor.submit(next_entity.get_wiki)))
+
+                    count = self.progression(count=count, modulo=self.modulo_entities, size=size, text='entity')
+
+                    wiki = future.result()
                     if wiki.summary is not None:
                         wikipedia['found'][name] = wiki
                     else:
                         wikipedia['not_found'].add(name)
 
-                else:
-                    if name in wikipedia['found']:
-                        wiki = wikipedia['found'][name]
-                    elif name in wikipedia['not_found']:
-                        wiki = Wikipedia()
-                    else:
-                        wiki = entity.get_wiki()
-                        if wiki.summary is not None:
-                            wikipedia['found'][name] = wiki
-                        else:
-                            wikipedia['not_found'].add(name)
+                    entity.wiki = wiki
 
-                entity.wiki = wiki
+            except (KeyboardInterrupt, WikipediaException, RequestException) as err:
+                self.print("An error occurred, saving the loaded information and leaving... (%s: %s)"
+                           % (type(err).__name__, str(err)))
 
-        except (KeyboardInterrupt, WikipediaException) as err:
-            self.print("An error occurred, saving the loaded information and leaving... (%s)" % str(err))
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
 
         self.print("Final entries: %i found/%i not found." % (len(wikipedia['found']), len(wikipedia['not_found'])))
 
@@ -908,14 +932,19 @@ class AnnotationTask:
 
         return count
 
-    def correction(self, step):
+    def correction(self, steps):
         """
-        Performs the manual correction of the wikipedia information.
+        Performs the manual correction of the wikipedia information, the entities remaining to correct after a step
+        being passed on to the next one.
 
         Args:
-            step: int, step of the correction to perform, between 1 and 4.
+            steps: tuple, steps of the correction to perform (int between 1 and 4), in order.
         """
 
+        wrong_steps = [step for step in steps if step not in range(1, 5)]
+        if wrong_steps:
+            raise Exception("Wrong steps specified: %s (steps should be between 1 and 4)." % str(wrong_steps))
+
         to_correct = set([name for name, wiki in self.wikipedia['found'].items() if not wiki.exact])
         corrected = set()
 
@@ -928,120 +957,121 @@ class AnnotationTask:
 
         self.print("Entities to correct: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
 
-        if step is None:
-            raise Exception("There are entities to correct, precise a step.")
+        if not steps:
+            raise Exception("There are entities to correct, precise the steps.")
 
         try:
-            if step == 1:
-                count, size = 0, len(to_correct)
-                for name in sorted(to_correct):
-                    count = self.progression(count=count, modulo=self.modulo_entities, size=size,
-                                             text="to correct entity")
-
-                    preprocessed_name_1 = unidecode(name).lower().replace(".", "")
-                    preprocessed_name_2 = " ".join([word for word in preprocessed_name_1.split() if len(word) > 1])
-
-                    title = self.wikipedia['found'][name].title
-                    before_parenthesis = findall(r'(.*?)\s*\(', title)
-                    before_parenthesis = before_parenthesis[0] if before_parenthesis and before_parenthesis[0] \
-                        else title
-
-                    preprocessed_title_1 = unidecode(before_parenthesis).lower().replace(".", "")
-                    preprocessed_title_2 = " ".join([word for word in preprocessed_title_1.split() if len(word) > 1])
-
-                    if preprocessed_name_1 == preprocessed_title_1 or preprocessed_name_2 == preprocessed_title_2:
-                        self.wikipedia['found'][name].exact = True
-                        corrected.add(name)
-
-                to_correct, corrected = to_correct.difference(corrected), set()
-                self.print("First step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
-
-            elif step == 2:
-                count, size = 0, len(to_correct)
-                for name in sorted(to_correct):
-                    count = self.progression(count=count, modulo=self.modulo_entities, size=size,
-                                             text="to correct entity")
+            for step in steps:
+                if step == 1:
+                    count, size = 0, len(to_correct)
+                    for name in sorted(to_correct):
+                        count = self.progression(count=count, modulo=self.modulo_entities, size=size,
+                                                 text="to correct entity")
+
+                        preprocessed_name_1 = unidecode(name).lower().replace(".", "")
+                        preprocessed_name_2 = " ".join([word for word in preprocessed_name_1.split() if len(word) > 1])
+
+                        title = self.wikipedia['found'][name].title
+                        before_parenthesis = findall(r'(.*?)\s*\(', title)
+                        before_parenthesis = before_parenthesis[0] if before_parenthesis and before_parenthesis[0] \
+                            else title
+
+                        preprocessed_title_1 = unidecode(before_parenthesis).lower().replace(".", "")
+                        preprocessed_title_2 = " ".join([word for word in preprocessed_title_1.split()
+                                                         if len(word) > 1])
+
+                        if preprocessed_name_1 == preprocessed_title_1 or preprocessed_name_2 == preprocessed_title_2:
+                            self.wikipedia['found'][name].exact = True
+                            corrected.add(name)
+
+                    to_correct, corrected = to_correct.difference(corrected), set()
+                    self.print("First step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
+
+                elif step == 2:
+                    count, size = 0, len(to_correct)
+                    for name in sorted(to_correct):
+                        count = self.progression(count=count, modulo=self.modulo_entities, size=size,
+                                                 text="to correct entity")
 
-                    while True:
-                        answer = input(name + "/" + self.wikipedia['found'][name].title + ": is this good? [y/n/o/d]")
-                        if answer in ["y", "n", "o", "d"]:
-                            break
-                        else:
-                            self.print('Answer should be "y" (yes), "n" (no), "o" (open) or "d" (discard), try again.')
-
-                    if answer == "o":
                         while True:
-                            answer = input(self.wikipedia['found'][name].get_info() + ": is this good? [y/n/d]")
-                            if answer in ["y", "n", "d"]:
+                            answer = input(name + "/" + self.wikipedia['found'][name].title
+                                           + ": is this good? [y/n/o/d]")
+                            if answer in ["y", "n", "o", "d"]:
                                 break
                             else:
-                                self.print('Answer should be "y" (yes), "n" (no) or "d" (discard), try again.')
+                                self.print('Answer should be "y" (yes), "n" (no), "o" (open) or "d" (discard), '
+                                           'try again.')
+
+                        if answer == "o":
+                            while True:
+                                answer = input(self.wikipedia['found'][name].get_info() + ": is this good? [y/n/d]")
+                                if answer in ["y", "n", "d"]:
+                                    break
+                                else:
+                                    self.print('Answer should be "y" (yes), "n" (no) or "d" (discard), try again.')
+
+                        if answer == "y":
+                            self.wikipedia['found'][name].exact = True
+                            corrected.add(name)
+
+                        elif answer == "d":
+                            del self.wikipedia['found'][name]
+                            self.wikipedia['not_found'].add(name)
+                            corrected.add(name)
+
+                    to_correct, corrected = to_correct.difference(corrected), set()
+                    self.print("Second step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
+
+                elif step == 3:
+                    count, size = 0, len(to_correct)
+                    for name in sorted(to_correct):
+                        count = self.progression(count=count, modulo=self.modulo_entities, size=size,
+                                                 text='to correct entity')
+
+                        wiki_search = search(name)
+                        self.print("Wikipedia search for %s:" % name)
+                        for cmpt, title in enumerate(wiki_search):
+                            self.print("%s: %s" % (str(cmpt + 1), + title))
 
-                    if answer == "y":
-                        self.wikipedia['found'][name].exact = True
-                        corrected.add(name)
+                        while True:
+                            try:
+                                answer = int(input("Which number is the good one? (0 for giving up this example)"))
+                                if answer in range(len(wiki_search) + 1):
+                                    break
+                                else:
+                                    self.print("Answer should be between 0 and the length of the search, try again.")
+                            except ValueError:
+                                self.print("Answer should be an int, try again.")
+
+                        if answer == 0:
+                            del self.wikipedia['found'][name]
+                            self.wikipedia['not_found'].add(name)
+                            corrected.add(name)
+                            self.print("Considered not found.")
 
-                    elif answer == "d":
-                        del self.wikipedia['found'][name]
-                        self.wikipedia['not_found'].add(name)
-                        corrected.add(name)
+                        else:
+                            try:
+                                p = page(wiki_search[answer - 1])
+                                self.wikipedia['found'][name] = Wikipedia(p)
 
-                to_correct, corrected = to_correct.difference(corrected), set()
-                self.print("Second step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
+                            except DisambiguationError:
+                                self.print("Search is still ambiguous, moving on to the next one...")
 
-            elif step == 3:
-                count, size = 0, len(to_correct)
-                for name in sorted(to_correct):
-                    count = self.progression(count=count, modulo=self.modulo_entities, size=size,
-                                             text='to correct entity')
+                    to_correct, corrected = to_correct.difference(corrected), set()
+                    self.print("Third step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
 
-                    wiki_search = search(name)
-                    self.print("Wikipedia search for %s:" % name)
-                    for cmpt, title in enumerate(wiki_search):
-                        self.print("%s: %s" % (str(cmpt + 1), + title))
+                elif step == 4:
+                    count, size = 0, len(to_correct)
+                    for name in sorted(to_correct):
+                        count = self.progression(count=count, modulo=self.modulo_entities, size=size,
+                                                 text='to correct entity')
 
-                    while True:
-                        try:
-                            answer = int(input("Which number is the good one? (0 for giving up this example)"))
-                            if answer in range(len(wiki_search) + 1):
-                                break
-                            else:
-                                self.print("Answer should be between 0 and the length of the search, try again.")
-                        except ValueError:
-                            self.print("Answer should be an int, try again.")
-
-                    if answer == 0:
                         del self.wikipedia['found'][name]
                         self.wikipedia['not_found'].add(name)
                         corrected.add(name)
-                        self.print("Considered not found.")
-
-                    else:
-                        try:
-                            p = page(wiki_search[answer - 1])
-                            self.wikipedia['found'][name] = Wikipedia(p)
-
-                        except DisambiguationError:
-                            self.print("Search is still ambiguous, moving on to the next one...")
-
-                to_correct, corrected = to_correct.difference(corrected), set()
-                self.print("Third step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
 
-            elif step == 4:
-                count, size = 0, len(to_correct)
-                for name in sorted(to_correct):
-                    count = self.progression(count=count, modulo=self.modulo_entities, size=size,
-                                             text='to correct entity')
-
-                    del self.wikipedia['found'][name]
-                    self.wikipedia['not_found'].add(name)
-                    corrected.add(name)
-
-                to_correct, corrected = to_correct.difference(corrected), set()
-                self.print("Fifth step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
-
-            else:
-                raise Exception("Wrong step specified.")
+                    to_correct, corrected = to_correct.difference(corrected), set()
+                    self.print("Fifth step over, remaining: %i/%i." % (len(to_correct), len(self.wikipedia['found'])))
 
         except KeyboardInterrupt:
             self.print("Keyboard interruption, saving the results...")
@@ -598,7 +598,7 @@ class Coreference:
 
 class Token:
 
-    punctuation = [p for p in string_punctuation] + ["''", '``']
+    punctuation = frozenset(string_punctuation) | {"''", '``'}
     stopwords = set(nltk_stopwords.words('english'))
 
     def __init__(self, token_element):
@@ -13,7 +13,7 @@ Usages:
 from database_creation.annotation_task import AnnotationTask
 from toolbox.utils import standard_parser
 from toolbox.parameters import YEARS, MAX_TUPLE_SIZE, RANDOM, ANNOTATION_TASK_SHORT_SIZE, ANNOTATION_TASK_SEED, \
-    LOAD_WIKI, WIKIPEDIA_FILE_NAME, CORRECT_WIKI
+    LOAD_WIKI, WIKIPEDIA_FILE_NAME, WIKIPEDIA_WORKERS, CORRECT_WIKI, CORRECT_WIKI_STEPS
 from toolbox.paths import NYT_ANNOTATED_CORPUS_PATH, ANNOTATION_TASK_RESULTS_PATH
 
 
@@ -47,10 +47,10 @@ def main():
 
     annotation_task.preprocess_database()
     annotation_task.process_articles()
-    annotation_task.process_wikipedia(load=LOAD_WIKI, file_name=WIKIPEDIA_FILE_NAME)
+    annotation_task.process_wikipedia(load=LOAD_WIKI, file_name=WIKIPEDIA_FILE_NAME, workers=WIKIPEDIA_WORKERS)
 
     if CORRECT_WIKI:
-        annotation_task.correct_wiki(step=None, out_name=WIKIPEDIA_FILE_NAME)
+        annotation_task.correct_wiki(steps=CORRECT_WIKI_STEPS, out_name=WIKIPEDIA_FILE_NAME)
 
     annotation_task.process_queries(load=False)
 
@@ -1,11 +1,10 @@
 """
-Metrics to evaluate the performance on the ranking task. The methods take two torch.Tensor as arguments (the ranks
-predicted and the targets), and return the corresponding score in a torch.Tensor.
+Metrics to evaluate the performance on the ranking task. The methods take two numpy.ndarray as arguments (the ranks
+predicted and the targets), and return the corresponding score as a float (or None if it is not defined). Numpy is used
+instead of torch as, for rankings of a few dozens of choices, the dispatch overhead of each operation dominates.
 """
 
-from modeling.utils import get_ranks
-
-import torch
+from numpy import arange, argsort, dot, empty, log2, sort
 
 
 def average_precision(ranks, targets):
@@ -17,10 +16,7 @@ def average_precision(ranks, targets):
         return None
 
     else:
-        ranks1 = ranks.expand((n, n))
-        ranks2 = ranks.reshape((-1, 1)).expand((n, n))
-
-        return torch.div(torch.ge(ranks2, ranks1).sum(dim=1).type(torch.float), ranks.type(torch.float)).mean()
+        return float((arange(1, n + 1) / sort(ranks)).mean())
 
 
 def precision_at_k(ranks, targets, k):
@@ -31,10 +27,7 @@ def precision_at_k(ranks, targets, k):
         mask = ranks <= k
         targets = targets[mask]
 
-        mask = targets > 0
-        targets[mask] = 1
-
-        return torch.div(targets.sum().type(torch.float), k)
+        return float((targets > 0).sum() / k)
 
 
 def precision_at_10(ranks, targets):
@@ -50,7 +43,7 @@ def recall_at_k(ranks, targets, k):
         mask = ranks <= k
         targets = targets[mask]
 
-        return torch.div(targets.sum().type(torch.float), n)
+        return float(targets.sum() / n)
 
 
 def recall_at_10(ranks, targets):
@@ -65,7 +58,7 @@ def reciprocal_best_rank(ranks, targets):
         mask = targets > 0
         ranks = ranks[mask]
 
-        return ranks.min().type(torch.float).reciprocal()
+        return float(1. / ranks.min())
 
 
 def reciprocal_average_rank(ranks, targets):
@@ -76,23 +69,29 @@ def reciprocal_average_rank(ranks, targets):
         mask = targets > 0
         ranks = ranks[mask]
 
-        return ranks.type(torch.float).mean().reciprocal()
+        return float(1. / ranks.mean())
 
 
 def ndcg_at_k(ranks, targets, k):
-    perfect_ranks = get_ranks(targets.reshape((-1, 1)))
+    if targets.sum() == 0:
+        return None
+
+    else:
+        n = len(targets)
+        perfect_ranks = empty(n, dtype=ranks.dtype)
+        perfect_ranks[argsort(-targets, kind='stable')] = arange(1, n + 1)
 
-    mask1, mask2 = ranks <= k, perfect_ranks <= k
-    ranks, perfect_ranks = ranks[mask1], perfect_ranks[mask2]
-    targets1, targets2 = targets[mask1], targets[mask2]
+        mask1, mask2 = ranks <= k, perfect_ranks <= k
+        ranks, perfect_ranks = ranks[mask1], perfect_ranks[mask2]
+        targets1, targets2 = targets[mask1], targets[mask2]
 
-    g1 = torch.pow(2, targets1) - 1
-    g2 = torch.pow(2, targets2) - 1
+        g1 = 2. ** targets1 - 1
+        g2 = 2. ** targets2 - 1
 
-    d1 = torch.log2(ranks.type(torch.float) + 1).reciprocal()
-    d2 = torch.log2(perfect_ranks.type(torch.float) + 1).reciprocal()
+        d1 = 1. / log2(ranks + 1.)
+        d2 = 1. / log2(perfect_ranks + 1.)
 
-    return torch.div(torch.dot(g1.type(torch.float), d1), torch.dot(g2.type(torch.float), d2))
+        return float(dot(g1, d1) / dot(g2, d2))
 
 
 def ndcg_at_10(ranks, targets):
@@ -100,20 +99,22 @@ def ndcg_at_10(ranks, targets):
 
 
 if __name__ == '__main__':
+    from modeling.utils import get_ranks
     from sklearn.metrics import average_precision_score
     from numpy import zeros
     from numpy.random import rand, choice
+    import torch
 
     epsilon = 0.0000001
 
     for _ in range(100000):
         s = rand(24)
-        r = get_ranks(torch.Tensor(s).reshape((-1, 1)))
+        r = get_ranks(torch.Tensor(s).reshape((-1, 1))).numpy()
         t = zeros(24)
         for i in choice(range(24), 3):
             t[i] = 1
 
-        a1 = average_precision(r, torch.Tensor(t).type(torch.float)).item()
+        a1 = average_precision(r, t)
         a2 = average_precision_score(t, s)
 
         if abs(a1 - a2) > epsilon:
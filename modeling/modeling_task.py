@@ -2,9 +2,9 @@ from modeling.ranking_task import RankingTask
 from modeling.utils import format_context, format_targets
 
 from collections import defaultdict
-from numpy import asarray, split, concatenate
+from numpy import asarray, split, arange, repeat
 from numpy.random import seed, shuffle
-from pickle import dump, load
+from pickle import dump, load, loads
 from re import findall
 from csv import writer
 from os import makedirs
@@ -12,8 +12,10 @@ from os.path import exists
 
 
 class ModelingTask:
+    data_loader_names = ("train", "valid", "test")
+
     def __init__(self, ranking_size, batch_size, context_format, targets_format, context_max_size, k_cross_validation,
-                 valid_proportion, test_proportion, random_seed, save, silent, results_path,
+                 valid_proportion, test_proportion, short_size, random_seed, save, silent, results_path,
                  annotation_task_results_path):
         """
         Initializes an instance of the base ModelingTask.
@@ -27,6 +29,7 @@ class ModelingTask:
             k_cross_validation: int, number of folds to use in k-fold cross validation (if 0, doesn't use k-fold).
             valid_proportion: float, fraction (between 0 and 1) of the data to keep in the valid set.
             test_proportion: float, fraction (between 0 and 1) of the data to keep in the test set.
+            short_size: int, number of ranking tasks of each data loader (of each fold) saved in the short task.
             random_seed: int, the seed to use for the random processes.
             save: bool, saving option.
             silent: bool, silent option.
@@ -42,6 +45,7 @@ class ModelingTask:
         self.k_cross_validation = k_cross_validation
         self.valid_proportion = valid_proportion
         self.test_proportion = test_proportion
+        self.short_size = short_size
         self.save = save
         self.silent = silent
         self.results_path = results_path
@@ -53,6 +57,25 @@ class ModelingTask:
 
         seed(random_seed)
 
+    def __getattr__(self, name):
+        """ Loads a data loader of a task loaded from file_name (see toolbox.utils.load_task) the first time it is
+        accessed, so that only the data loaders actually used are read. """
+
+        data_loader_name = name[:-len("_loader")]
+
+        if name.endswith("_loader") and data_loader_name in self.data_loader_names and "file_name" in self.__dict__:
+            loader_file_name = self.loader_file_name(self.__dict__["file_name"], data_loader_name,
+                                                     short=self.__dict__.get("short", False))
+
+            with open(loader_file_name, 'rb') as file:
+                data_loader = loads(file.read())
+
+            setattr(self, name, data_loader)
+
+            return data_loader
+
+        raise AttributeError(name)
+
     # region Main methods
 
     def process_data_loaders(self):
@@ -149,14 +172,14 @@ class ModelingTask:
             n_test += (n - n_test) % k
 
             test_set, cross_validation_set = split(asarray(ranking_tasks), [n_test])
-            cross_validation_split = split(cross_validation_set, k)
+            fold_ids = repeat(arange(k), cross_validation_set.shape[0] // k)
 
             train_sets, valid_sets = [], []
             n_trains, n_valids = set(), set()
 
             for i in range(k):
-                train_set = concatenate([cross_validation_split[j] for j in range(k) if j != i])
-                valid_set = cross_validation_split[i]
+                train_set = cross_validation_set[fold_ids != i]
+                valid_set = cross_validation_set[fold_ids == i]
 
                 train_sets.append(train_set)
                 valid_sets.append(valid_set)
@@ -368,13 +391,12 @@ class ModelingTask:
     def suffix(self):
         """ Returns the standard suffix of a file_name as a string. """
 
-        train_proportion = ("%.2f" % (1 - self.valid_proportion - self.test_proportion)).split(".")[1]
-        valid_proportion = ("%.2f" % self.valid_proportion).split(".")[1]
-        test_proportion = ("%.2f" % self.test_proportion).split(".")[1]
-        suffix = "_" + "-".join([train_proportion, valid_proportion, test_proportion])
-
-        suffix += "_rs" + str(self.ranking_size) if self.ranking_size is not None else ""
-        suffix += "_bs" + str(self.batch_size)
+        # proportions as two digits percentages (the digits after the decimal point)
+        train_proportion = 1 - self.valid_proportion - self.test_proportion
+        suffix = "_%02d-%02d-%02d" % tuple(round(100 * proportion) % 100 for proportion in
+                                           (train_proportion, self.valid_proportion, self.test_proportion))
+        suffix += "_rs%i" % self.ranking_size if self.ranking_size is not None else ""
+        suffix += "_bs%i" % self.batch_size
         suffix += "_cf-" + self.context_format if self.context_format is not None else ""
         suffix += "_tf-" + self.targets_format if self.targets_format is not None else ""
         suffix += "_cv" if self.k_cross_validation else ""
@@ -394,16 +416,68 @@ class ModelingTask:
                 makedirs(folder_name)
                 self.print("Creating folder(s) %s." % folder_name)
 
+    @staticmethod
+    def loader_file_name(file_name, data_loader_name, short):
+        """
+        Returns the name of the file of a data loader of the Task saved in file_name.
+
+        Args:
+            file_name: str, name of the file of the Task.
+            data_loader_name: str, name of the data loader ("train", "valid" or "test").
+            short: bool, whether to return the name of the file of the short data loader.
+        """
+
+        return file_name[:-len('.pkl')] + "_" + data_loader_name + ("_short" if short else "") + '.pkl'
+
+    def short_loader(self, data_loader_name):
+        """
+        Returns the short version of a data loader, with only its first self.short_size ranking tasks (in each fold
+        for the cross validation train and valid data loaders).
+
+        Args:
+            data_loader_name: str, name of the data loader ("train", "valid" or "test").
+        """
+
+        data_loader = getattr(self, data_loader_name + "_loader")
+
+        if self.k_cross_validation and data_loader_name != "test":
+            return [fold_loader[:self.short_size] for fold_loader in data_loader]
+
+        else:
+            return data_loader[:self.short_size]
+
     def save_pkl(self):
-        """ Save the Task using pickle in self.results_path. """
+        """ Save the Task using pickle in self.results_path, with each of its data loader in its own file. """
 
         file_name = self.results_path + self.class_name() + self.suffix() + '.pkl'
 
         if self.save:
-            with open(file_name, 'wb') as file:
-                dump(obj=self, file=file, protocol=-1)
+            if self.__dict__.get("short"):
+                raise Exception("The task was loaded with its short data loaders, it can't be saved.")
+
+            data_loaders = {data_loader_name: getattr(self, data_loader_name + "_loader")
+                            for data_loader_name in self.data_loader_names}
+
+            # the data loaders (and the file information of a loaded task) are detached while the task is pickled
+            detached_names = [data_loader_name + "_loader" for data_loader_name in self.data_loader_names]
+            detached = {name: self.__dict__.pop(name) for name in detached_names + ["file_name", "short"]
+                        if name in self.__dict__}
+
+            try:
+                with open(file_name, 'wb') as file:
+                    dump(obj=self, file=file, protocol=-1)
+
+            finally:
+                self.__dict__.update(detached)
+
+            for data_loader_name, data_loader in data_loaders.items():
+                with open(self.loader_file_name(file_name, data_loader_name, short=False), 'wb') as file:
+                    dump(obj=data_loader, file=file, protocol=-1)
+
+                with open(self.loader_file_name(file_name, data_loader_name, short=True), 'wb') as file:
+                    dump(obj=self.short_loader(data_loader_name), file=file, protocol=-1)
 
-            self.print("Task saved at %s.\n" % file_name)
+            self.print("Task saved at %s (and its data loaders, full and short, next to it).\n" % file_name)
 
         else:
             self.print("Not saving %s (not in save mode).\n" % file_name)
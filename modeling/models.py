@@ -2,25 +2,38 @@ from modeling.utils import *
 from modeling import metrics
 from modeling.modules import LogisticRegression
 
-from numpy import arange, mean, std
-from numpy.random import seed, shuffle
-from collections import defaultdict
+from numpy import arange, asarray
+from numpy.random import seed, default_rng
+from collections import defaultdict, Counter
 from copy import deepcopy
+from itertools import chain
 from re import findall
+from pickle import dump, load
 from string import punctuation as str_punctuation
 from nltk.corpus import stopwords as nltk_stopwords
 from nltk.stem import WordNetLemmatizer
-from tqdm import tqdm_notebook as tqdm
-from torch.utils.tensorboard import SummaryWriter
-from fairseq.data.data_utils import collate_tokens
-from os.path import join as path_join
-import matplotlib.pyplot as plt
+from torch.utils.data import DataLoader
+from os import makedirs, replace
+from os.path import join as path_join, exists
+from tempfile import NamedTemporaryFile
 import torch
 
+STOPWORDS = frozenset(nltk_stopwords.words('english'))
+LEMMATIZER = WordNetLemmatizer()
+LEMMAS = Lemmas(LEMMATIZER)
+PUNCTUATION_TABLE = str.maketrans('', '', str_punctuation)
+
+# version of the words preprocessing (get_words), to increment when its outputs change so that the persisted words
+# caches are dropped
+WORDS_VERSION = 1
+
 
 class BaseModel:
     """ Model structure. """
 
+    # whether the rankings can be evaluated in forked worker processes
+    forkable = True
+
     def __init__(self, args, pretrained_model):
         """
         Initializes an instance of Model.
@@ -31,22 +44,45 @@ class BaseModel:
         """
 
         self.scores_names = args.scores_names
+        self.scores_functions = {name: getattr(metrics, name) for name in self.scores_names}
         self.context_max_size = args.context_max_size
         self.context_format = args.context_format
         self.targets_format = args.targets_format
+        self.num_workers = args.num_workers if self.forkable else 0
         self.pretrained_model = pretrained_model
+        self.embedding_vectors, self.embedding_idxs = None, None
+        self.average_embeddings = dict()
+
+        if hasattr(pretrained_model, 'vectors'):  # pretrained word embedding
+            self.embedding_vectors = pretrained_model.vectors
+            self.embedding_idxs = EmbeddingIdxs(pretrained_model)
 
         self.train_losses, self.train_scores = [], defaultdict(list)
         self.valid_losses, self.valid_scores = [], defaultdict(list)
         self.test_losses, self.test_scores = [], defaultdict(list)
 
         self.punctuation = str_punctuation
-        self.stopwords = set(nltk_stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+        self.punctuation_table = PUNCTUATION_TABLE
+        self.stopwords = STOPWORDS
+        self.lemmatizer = LEMMATIZER
+        self.lemmas = LEMMAS
+
+        self.words_cache = dict()
+        self.cache_sizes = dict()
+        self.cache_path = path_join(args.root, args.cache_path) if args.cache else None
+
+        if args.num_workers and not self.forkable:
+            print("Warning: %s ignores num_workers and evaluates the rankings in the main process."
+                  % type(self).__name__)
+
+        if self.cache_path is not None and self.num_workers:
+            print("Warning: the cache entries computed in the worker processes are not saved.")
 
         self.writer = None
 
         if args.tensorboard:
+            from torch.utils.tensorboard import SummaryWriter
+
             root = args.root
             tensorboard_logs_path = args.tensorboard_logs_path
             model_name = self.__class__.__name__
@@ -55,6 +91,7 @@ class BaseModel:
             self.writer = SummaryWriter(path_join(root, tensorboard_logs_path, model_name))
 
         seed(args.random_seed), torch.manual_seed(args.random_seed)
+        self.rng = default_rng(args.random_seed)
 
     # region Training pipeline methods
 
@@ -75,6 +112,8 @@ class BaseModel:
         unseen_examples = args.unseen_examples
 
         if not show:
+            self.load_caches()
+
             self.preview(task.train_loader)
 
             print("Evaluation on the valid loader...")
@@ -83,6 +122,8 @@ class BaseModel:
             print("Evaluation on the test loader...")
             self.test(task.test_loader)
 
+            self.save_caches()
+
         else:
             self.show(task,
                       show_rankings=show_rankings,
@@ -110,9 +151,7 @@ class BaseModel:
         data_loaders = []
 
         if random_examples:
-            data_loader = task.valid_loader
-            shuffle(data_loader)
-            data_loader = data_loader[:show_rankings]
+            data_loader = self.shuffled(task.valid_loader)[:show_rankings]
 
             data_loaders.append(data_loader)
 
@@ -253,40 +292,95 @@ class BaseModel:
         epoch_losses, epoch_scores = [], defaultdict(list)
         n_rankings = len(data_loader)
 
-        shuffle(data_loader)
+        data_loader = self.shuffled(data_loader)
+        prepared_rankings = None
+
+        if self.num_workers:
+            evaluations = DataLoader(EvaluationDataset(data_loader=data_loader, evaluate=self.evaluate_ranking),
+                                     batch_size=None,
+                                     num_workers=self.num_workers)
+        else:
+            # the next rankings are prepared in a background thread while the current one is evaluated
+            prepared_rankings = Prefetcher(data_loader, self.prepare_ranking)
+            evaluations = (self.evaluate_ranking(ranking=ranking, prepared=True) for ranking in prepared_rankings)
 
-        for ranking_idx, ranking in tqdm(enumerate(data_loader), total=n_rankings):
-            ranking_loss, ranking_score = self.evaluate_ranking(ranking=ranking)
+        try:
+            for ranking_idx, (ranking_loss, ranking_score) in progress_bar(enumerate(evaluations), total=n_rankings):
+                self.write_tensorboard(loss=ranking_loss, score=ranking_score, tag='test', step=ranking_idx)
+                epoch_losses.append(ranking_loss), dict_append(epoch_scores, ranking_score)
 
-            self.write_tensorboard(loss=ranking_loss, score=ranking_score, tag='test', step=ranking_idx)
-            epoch_losses.append(ranking_loss), dict_append(epoch_scores, ranking_score)
+        finally:
+            if prepared_rankings is not None:
+                prepared_rankings.close()
 
         return epoch_losses, epoch_scores
 
-    def evaluate_ranking(self, ranking):
+    def evaluate_ranking(self, ranking, prepared=False):
         """
         Evaluate the model for one ranking task.
 
         Args:
             ranking: list, batches (inputs, targets) of the ranking task.
+            prepared: bool, whether the ranking has already been prepared with prepare_ranking.
 
         Returns:
             ranking_loss: float, loss of the ranking task.
             ranking_score: dict, list of scores (float) of the ranking task, mapped with the score's names.
         """
 
+        if not prepared:
+            ranking = self.prepare_ranking(ranking)
+
+        ranking_outputs, ranking_targets = self.ranking_outputs(ranking)
+
+        ranks = get_ranks(ranking_outputs)
+        batch_score = self.get_score(ranks, ranking_targets)
+
+        return None, batch_score
+
+    def prepare_ranking(self, ranking):
+        """
+        Returns the ranking prepared for ranking_outputs; by default, the ranking itself. Models can override it to do
+        in advance (in a background thread, see evaluate_epoch) the work which doesn't depend on the model's state.
+
+        Args:
+            ranking: list, batches (inputs, targets) of the ranking task.
+        """
+
+        return ranking
+
+    def ranking_outputs(self, ranking):
+        """
+        Returns the outputs and the targets of a prepared ranking task.
+
+        Args:
+            ranking: list, prepared batches of the ranking task (see prepare_ranking).
+
+        Returns:
+            torch.Tensor, outputs of the batches in a column Tensor.
+            torch.Tensor, targets of the batches in a line Tensor.
+        """
+
         ranking_outputs, ranking_targets = [], []
 
         for inputs, targets in ranking:
             outputs = self.pred(inputs)
             ranking_outputs.append(outputs), ranking_targets.append(targets)
 
-        ranking_outputs, ranking_targets = torch.cat(ranking_outputs), torch.cat(ranking_targets)
+        return torch.cat(ranking_outputs), torch.cat(ranking_targets)
 
-        ranks = get_ranks(ranking_outputs)
-        batch_score = self.get_score(ranks, ranking_targets)
+    def shuffled(self, data_loader):
+        """
+        Returns the ranking tasks of data_loader in a random order, without modifying data_loader.
 
-        return None, batch_score
+        Args:
+            data_loader: list, list of ranking tasks, which are lists of (inputs, targets) batches.
+
+        Returns:
+            list, shuffled list of ranking tasks.
+        """
+
+        return [data_loader[i] for i in self.rng.permutation(len(data_loader))]
 
     def pred(self, inputs):
         """
@@ -317,15 +411,10 @@ class BaseModel:
             dict, scores (float) of the ranking task mapped with the scores' names.
         """
 
-        score_dict = dict()
+        ranks, targets = ranks.numpy(), targets.numpy()
 
-        for name in self.scores_names:
-            score = getattr(metrics, name)(ranks=ranks.clone(),
-                                           targets=targets.clone())
-
-            score_dict[name] = score.data.item()
-
-        return score_dict
+        return {name: score_function(ranks=ranks, targets=targets)
+                for name, score_function in self.scores_functions.items()}
 
     @staticmethod
     def get_mean_std(epoch_losses, epoch_scores):
@@ -343,11 +432,9 @@ class BaseModel:
             score_std: float, standard deviation of the scores.
         """
 
-        epoch_scores, epoch_losses = deepcopy(epoch_scores), deepcopy(epoch_losses)
-
-        epoch_losses = list_remove_none(epoch_losses)
-        loss_mean = float(mean(epoch_losses)) if epoch_losses else None
-        loss_std = float(std(epoch_losses)) if epoch_losses else None
+        epoch_losses = asarray(list_remove_none(epoch_losses), dtype=float)
+        loss_mean = float(epoch_losses.mean()) if epoch_losses.size else None
+        loss_std = float(epoch_losses.std()) if epoch_losses.size else None
 
         score_mean = dict_mean(epoch_scores)
         score_std = dict_std(epoch_scores)
@@ -413,21 +500,13 @@ class BaseModel:
             list, preprocessed words of the string.
         """
 
-        if remove_punctuation:
-            s = s.translate(str.maketrans('', '', self.punctuation))
+        key = (s, remove_stopwords, remove_punctuation, lower, lemmatize)
 
-        words = s.split()
+        if key not in self.words_cache:
+            self.words_cache[key] = get_words(s, remove_stopwords, remove_punctuation, lower, lemmatize,
+                                              self.stopwords, self.lemmas, self.punctuation_table)
 
-        if remove_stopwords:
-            words = [word for word in words if word.lower() not in self.stopwords]
-
-        if lemmatize:
-            words = [self.lemmatizer.lemmatize(word) for word in words]
-
-        if lower:
-            words = [word.lower() for word in words]
-
-        return words
+        return self.words_cache[key]
 
     def get_choices_words(self, inputs, remove_stopwords=True, remove_punctuation=True, lower=True, lemmatize=False,
                           setten=False):
@@ -461,7 +540,7 @@ class BaseModel:
                                                  lemmatize=lemmatize))
 
         if flatten:
-            entities_words = [word for words in entities_words for word in words]
+            entities_words = list(chain.from_iterable(entities_words))
 
         return entities_words
 
@@ -513,9 +592,7 @@ class BaseModel:
                 wikis_words.append([])
 
         if flatten:
-            wikis_words = [word for words in wikis_words for word in words]
-            if setten:
-                wikis_words = set(wikis_words)
+            wikis_words = set(chain.from_iterable(wikis_words)) if setten else list(chain.from_iterable(wikis_words))
 
         else:
             if setten:
@@ -527,14 +604,12 @@ class BaseModel:
         """ Return the words from the inputs' entities, NYT articles and wikipedia articles, in a list (or a set, if
         setten). """
 
-        entities_words = self.get_entities_words(inputs, flatten=True)
+        entities_words = self.get_entities_words(inputs)
         context_words = self.get_context_words(inputs)
-        wikis_words = self.get_wikis_words(inputs, flatten=True)
-
-        other_words = entities_words + context_words + wikis_words
+        wikis_words = self.get_wikis_words(inputs)
 
-        if setten:
-            other_words = set(other_words)
+        other_words = chain(chain.from_iterable(entities_words), context_words, chain.from_iterable(wikis_words))
+        other_words = set(other_words) if setten else list(other_words)
 
         return other_words
 
@@ -551,8 +626,8 @@ class BaseModel:
             torch.Tensor, counts of words as a column tensor.
         """
 
-        counted_words = [[word for word in words if word in words_list] for words_list in words_lists]
-        return torch.tensor([len(w) for w in counted_words]).reshape((-1, 1))
+        words_counts = Counter(words)
+        return to_column_tensor([sum(words_counts[word] for word in set(words_list)) for words_list in words_lists])
 
     @staticmethod
     def get_sets_counts(words_sets, words):
@@ -567,69 +642,144 @@ class BaseModel:
             torch.Tensor, counts of words as a column tensor.
         """
 
-        counted_words = [words_set.intersection(words) for words_set in words_sets]
-        return torch.tensor([len(w) for w in counted_words]).reshape((-1, 1))
+        return to_column_tensor([sum(map(words.__contains__, words_set)) for words_set in words_sets])
 
     # endregion
 
     # region Word2Vec embedding methods
 
-    def get_word_embedding(self, word):
+    def get_average_embedding(self, words):
         """
-        Returns the pretrained embedding of a word in a line Tensor.
+        Returns the average pretrained embedding of words in a line Tensor.
 
         Args:
-            word: str, word to embed.
+            words: list, words to embed.
 
         Returns:
-            torch.Tensor, embedding of word.
+            torch.Tensor, average embedding of the words.
         """
 
-        return torch.tensor(self.pretrained_model[word]) if word in self.pretrained_model.vocab else None
+        idxs = [idx for idx in map(self.embedding_idxs.__getitem__, words) if idx is not None]
 
-    def get_average_embedding(self, words):
+        if idxs:
+            return torch.from_numpy(self.embedding_vectors[idxs].mean(axis=0))
+
+        else:
+            return torch.zeros(self.embedding_vectors.shape[1], dtype=torch.float)
+
+    def get_average_embeddings(self, words_lists):
         """
-        Returns the average pretrained embedding of words in a line Tensor.
+        Returns the average pretrained embeddings of each list of words of words_lists, gathering all the word vectors
+        at once. The average embedding of a list without known words is a zero Tensor.
 
         Args:
-            words: list, words to embed.
+            words_lists: list, words to embed, as a list of list of words.
 
         Returns:
-            torch.Tensor, average embedding of the words.
+            torch.Tensor, average embeddings of the lists of words, stacked in a Tensor.
         """
 
-        embeddings = [self.get_word_embedding(word) for word in words]
-        embeddings = [embedding for embedding in embeddings if embedding is not None]
+        embedding_idxs = self.embedding_idxs
 
-        if embeddings:
-            return torch.stack(embeddings).mean(dim=0)
+        idxs_lists = [[idx for idx in map(embedding_idxs.__getitem__, words) if idx is not None]
+                      for words in words_lists]
+        lengths = torch.tensor([len(idxs) for idxs in idxs_lists])
 
-        else:
-            word = list(self.pretrained_model.vocab)[0]
-            embedding = self.get_word_embedding(word)
+        vectors = torch.from_numpy(self.embedding_vectors[list(chain.from_iterable(idxs_lists))])
+        segments = torch.repeat_interleave(torch.arange(len(idxs_lists)), lengths)
+
+        sums = torch.zeros((len(idxs_lists), vectors.shape[1]), dtype=vectors.dtype).index_add_(0, segments, vectors)
 
-            return torch.zeros_like(embedding, dtype=torch.float)
+        return sums.div_(lengths.clamp(min=1).unsqueeze_(1))
 
     def get_average_embedding_similarity(self, words_lists, words):
         """
         Returns the similarities between the average embeddings of the lists of words of words_lists and the average
-        embedding of words.
+        embedding of words. The latter is cached, as words are the same for all the batches of a ranking task, and
+        persisted with the cache option.
 
         Args:
             words_lists: list, first words to compare, as a list of list of words.
-            words: list, second words to compare, as a list of words.
+            words: list, second words to compare, as a list (or a set) of words.
 
         Returns:
             torch.tensor, similarities in a column tensor.
         """
 
-        stacked_embeddings = torch.stack([self.get_average_embedding(words_list) for words_list in words_lists])
-        embedding = self.get_average_embedding(words).reshape((1, -1))
+        key = words_key(words)
+        if key not in self.average_embeddings:
+            self.average_embeddings[key] = self.get_average_embedding(words).reshape((1, -1))
+
+        stacked_embeddings = self.get_average_embeddings(words_lists)
+        embedding = self.average_embeddings[key]
 
         return torch.nn.functional.cosine_similarity(stacked_embeddings, embedding, dim=1).reshape((-1, 1))
 
     # endregion
 
+    # region Cache methods
+
+    def cached_attributes(self):
+        """ Returns the names of the cache attributes of the model mapped with their file names and their versions
+        (the cached entries are dropped when the version changes). """
+
+        words_version = "%i %s" % (WORDS_VERSION, words_key(sorted(self.stopwords)).hex())
+        cached_attributes = {'words_cache': ("words.pkl", words_version)}
+
+        if self.embedding_vectors is not None:
+            embedding_version = "%s %s" % (words_version, getattr(self.pretrained_model, 'file_key', None))
+            cached_attributes['average_embeddings'] = ("average_embeddings.pkl", embedding_version)
+
+        return cached_attributes
+
+    def load_caches(self):
+        """ Load the caches saved in self.cache_path, if the cache option is used. """
+
+        if self.cache_path is not None:
+            for attribute, (file_name, version) in self.cached_attributes().items():
+                file_name = path_join(self.cache_path, file_name)
+
+                if exists(file_name):
+                    with open(file_name, 'rb') as file:
+                        cache = load(file)
+
+                    if cache.get('version') == version:
+                        getattr(self, attribute).update(cache['entries'])
+                        print("Cache loaded from %s (%i entries)." % (file_name, len(getattr(self, attribute))))
+
+                    else:
+                        print("Cache of %s outdated, not loaded." % file_name)
+
+                self.cache_sizes[attribute] = len(getattr(self, attribute))
+
+            print()
+
+    def save_caches(self):
+        """ Save the caches in self.cache_path, if the cache option is used and they have new entries. Each file is
+        written in a temporary file first, then moved in place, so that a cache file is never partially written. """
+
+        if self.cache_path is not None:
+            if not exists(self.cache_path):
+                makedirs(self.cache_path)
+
+            for attribute, (file_name, version) in self.cached_attributes().items():
+                if len(getattr(self, attribute)) == self.cache_sizes.get(attribute):
+                    continue
+
+                file_name = path_join(self.cache_path, file_name)
+
+                with NamedTemporaryFile(dir=self.cache_path, suffix='.tmp', delete=False) as file:
+                    dump(obj={'version': version, 'entries': getattr(self, attribute)}, file=file, protocol=-1)
+
+                replace(file.name, file_name)
+                self.cache_sizes[attribute] = len(getattr(self, attribute))
+
+                print("Cache saved at %s (%i entries)." % (file_name, len(getattr(self, attribute))))
+
+            print()
+
+    # endregion
+
     # region Plot methods
 
     def plot(self, x1, x2, train_losses, valid_losses, valid_scores):
@@ -644,6 +794,8 @@ class BaseModel:
             valid_scores: dict, validation scores to plot.
         """
 
+        import matplotlib.pyplot as plt
+
         color_idx = 0
         colors = ['tab:red', 'tab:orange', 'tab:blue', 'tab:cyan', 'tab:green',
                   'tab:olive', 'tab:gray', 'tab:brown', 'tab:purple', 'tab:pink']
@@ -689,7 +841,7 @@ class BaseModel:
             x2 = list(arange(offset + 1, offset + n_epochs + 1))
             offset += n_epochs
 
-            train_losses = [x for epoch_losses in self.train_losses[i] for x in epoch_losses]
+            train_losses = list(chain.from_iterable(self.train_losses[i]))
             valid_losses = self.valid_losses[i]
             valid_scores = {name: self.valid_scores[name][i] for name in self.scores_names}
 
@@ -712,7 +864,7 @@ class Random(BaseModel):
     """ Baseline with random predictions. """
 
     def pred(self, inputs):
-        return torch.rand(len(inputs['choices'])).reshape((-1, 1))
+        return torch.rand(len(inputs['choices']), 1)
 
 
 class Frequency(BaseModel):
@@ -721,19 +873,18 @@ class Frequency(BaseModel):
     def __init__(self, args, pretrained_model):
         super().__init__(args=args, pretrained_model=pretrained_model)
 
-        self.counts = defaultdict(int)
+        self.counts = Counter()
 
     def preview(self, data_loader):
         print("Learning answers counts...")
 
-        for ranking_task in tqdm(data_loader, total=len(data_loader)):
+        for ranking_task in progress_bar(data_loader, total=len(data_loader)):
             for inputs, targets in ranking_task:
-                for choice, target in zip(inputs['choices'], targets):
-                    self.counts[choice] += target.data.item()
+                self.counts.update(dict(zip(inputs['choices'], targets.tolist())))
 
     def pred(self, inputs):
-        grades = [self.counts[choice] if choice in self.counts else 0 for choice in inputs['choices']]
-        return torch.tensor(grades).reshape((-1, 1))
+        grades = [self.counts[choice] for choice in inputs['choices']]
+        return to_column_tensor(grades)
 
 # endregion
 
@@ -783,7 +934,7 @@ class ActivatedSummaries(BaseModel):
                            for choice_words in choices_words]
         activated_wikis = [[wiki for wiki in activated_wiki if wiki] for activated_wiki in activated_wikis]
 
-        return torch.tensor([len(wikis) for wikis in activated_wikis]).reshape((-1, 1))
+        return to_column_tensor([len(wikis) for wikis in activated_wikis])
 
 
 class SummariesAverageEmbedding(BaseModel):
@@ -915,6 +1066,8 @@ class SummariesContextOverlapAverageEmbedding(BaseModel):
 class ClassifierBart(BaseModel):
     """ BART finetuned as a classifier between aggregation and not_aggregation. """
 
+    forkable = False  # CUDA can't be used in processes forked after its initialization
+
     def __init__(self, args, pretrained_model):
         super().__init__(args=args, pretrained_model=pretrained_model)
 
@@ -924,23 +1077,77 @@ class ClassifierBart(BaseModel):
 
         self.idx = labels.index("aggregation")
 
-    def pred(self, inputs):
+        self.bpe_codes = BpeCodes(bart.bpe)
+        self.stream = torch.cuda.Stream() if torch.cuda.is_available() else None
+
+    def prepare_ranking(self, ranking):
+        """ Encodes the batches of the ranking (copying them to the GPU on a side stream), so that the next rankings are
+        encoded while the current one is classified. """
+
+        return [(self.encode(inputs), targets) for inputs, targets in ranking]
+
+    def ranking_outputs(self, ranking):
+        ranking_outputs, ranking_targets = [], []
+
+        for batch_tokens, targets in ranking:
+            outputs = self.classify(batch_tokens)
+            ranking_outputs.append(outputs), ranking_targets.append(targets)
+
+        return torch.cat(ranking_outputs), torch.cat(ranking_targets)
+
+    def encode(self, inputs):
+        """ Returns the tokens of the pairs (context, choice) of the inputs batch, on the device of the model. """
+
+        from fairseq.data.data_utils import collate_tokens
+
         sentence1 = format_context(inputs,
                                    context_format=self.context_format,
                                    context_max_size=self.context_max_size)
 
-        batch_encoding = [self.pretrained_model.encode(sentence1, sentence2) for sentence2 in inputs['choices']]
+        batch_encoding = [self.encode_pair(sentence1, sentence2) for sentence2 in inputs['choices']]
         batch_tokens = collate_tokens(batch_encoding, pad_idx=1)
 
+        if self.stream is not None:
+            with torch.cuda.stream(self.stream):
+                batch_tokens = batch_tokens.pin_memory().to(self.pretrained_model.device, non_blocking=True)
+
+        return batch_tokens
+
+    def encode_pair(self, sentence1, sentence2):
+        """ Same as BART's encode(sentence1, sentence2), but with the BPE codes of the sentences memoized, as the same
+        context is paired with all the choices of a ranking, and the same choices appear in many rankings. """
+
+        bart = self.pretrained_model
+
+        codes1 = self.bpe_codes[sentence1]
+        if len(codes1.split(' ')) > bart.max_positions - 2:
+            codes1 = ' '.join(codes1.split(' ')[:bart.max_positions - 2])
+
+        bpe_sentence = '<s> ' + codes1 + ' </s> ' + self.bpe_codes[sentence2] + ' </s>'
+
+        return bart.task.source_dictionary.encode_line(bpe_sentence, append_eos=False).long()
+
+    def classify(self, batch_tokens):
+        """ Returns the probabilities of aggregation of the encoded pairs batch_tokens, as a column torch.Tensor. """
+
+        if self.stream is not None:
+            torch.cuda.current_stream().wait_stream(self.stream)
+            batch_tokens.record_stream(torch.cuda.current_stream())
+
         with torch.no_grad():
             logprobs = self.pretrained_model.predict('sentence_classification_head', batch_tokens)
 
-        return logprobs[:, self.idx].exp().reshape((-1, 1))
+        return logprobs[:, self.idx].exp().reshape((-1, 1)).cpu()
+
+    def pred(self, inputs):
+        return self.classify(self.encode(inputs))
 
 
 class GeneratorBart(BaseModel):
     """ BART finetuned as a generator of aggregation. """
 
+    forkable = False  # CUDA can't be used in processes forked after its initialization
+
     def __init__(self, args, pretrained_model):
         super().__init__(args, pretrained_model)
 
@@ -972,9 +1179,9 @@ class GeneratorBart(BaseModel):
 
         fname = "examples"
         n_rankings = len(data_loader)
-        shuffle(data_loader)
+        data_loader = self.shuffled(data_loader)
 
-        for idx, ranking in tqdm(enumerate(data_loader), total=n_rankings):
+        for idx, ranking in progress_bar(enumerate(data_loader), total=n_rankings):
             entities = ranking[0][0]['entities']
             source = format_context(ranking,
                                     context_format=self.context_format,
@@ -1035,7 +1242,7 @@ class GeneratorBart(BaseModel):
 
         assert inputs['choices'] == [choice for choice, _ in scores]
 
-        return torch.tensor([prob for _, prob in scores]).reshape((-1, 1))
+        return to_column_tensor([prob for _, prob in scores])
 
 # endregion
 
@@ -1068,11 +1275,15 @@ class CustomClassifier(Frequency):
         unseen_examples = args.unseen_examples
 
         if not show:
+            self.load_caches()
+
             self.preview(task.train_loader)
 
             print("Training on the train loader...")
             self.train(task.train_loader, task.valid_loader, task.test_loader)
 
+            self.save_caches()
+
         else:
             self.show(task,
                       show_rankings=show_rankings,
@@ -1108,7 +1319,7 @@ class CustomClassifier(Frequency):
             features = []
 
             # frequency
-            feature = self.counts[choice] if choice in self.counts else 0
+            feature = self.counts[choice]
             features.append(feature)
 
             # summaries count
@@ -1202,21 +1413,28 @@ class CustomClassifier(Frequency):
 
         return torch.tensor(batch_features).type(torch.float)
 
+    def add_features(self, ranking_task):
+        """ Computes the features of the batches of ranking_task which don't have them yet, and returns it. """
+
+        for inputs, _ in ranking_task:
+            if 'features' not in inputs:
+                inputs['features'] = self.get_batch_features(inputs)
+
+        return ranking_task
+
     def train(self, train_loader, valid_loader, test_loader):
         for i_epoch in range(self.n_epochs):
             print("Epoch %i/%i..." % (i_epoch+1, self.n_epochs))
 
-            for ranking_task in tqdm(train_loader):
-                for inputs, targets in ranking_task:
-                    if 'features' not in inputs:
-                        inputs['features'] = self.get_batch_features(inputs)
-
-                    self.optimizer.zero_grad()
-                    pred = self.module(inputs['features'])
+            with Prefetcher(train_loader, self.add_features) as prefetcher:
+                for ranking_task in progress_bar(prefetcher, total=len(train_loader)):
+                    for inputs, targets in ranking_task:
+                        self.optimizer.zero_grad()
+                        pred = self.module(inputs['features'])
 
-                    loss = self.criterion(pred, targets)
-                    loss.backward()
-                    self.optimizer.step()
+                        loss = self.criterion(pred, targets)
+                        loss.backward()
+                        self.optimizer.step()
 
             print("Evaluation on the valid loader...")
             self.valid(valid_loader)
@@ -1,5 +1,4 @@
 from numpy.random import shuffle, choice
-from numpy import asarray, arange, split
 import torch
 
 
@@ -125,20 +124,13 @@ class RankingTask:
                           'nyt_titles': self.nyt_titles,
                           'nyt_contexts': self.nyt_contexts}
 
-        idxs = arange(self.batch_size, len(self.choices), self.batch_size)
-        input_batches = [{'choices': list(choices)} for choices in split(asarray(self.choices), idxs)]
-
-        for input_batch in input_batches:
-            input_batch.update(generic_inputs)
-
-        return input_batches
+        return [{**generic_inputs, 'choices': self.choices[i:i + self.batch_size]}
+                for i in range(0, len(self.choices), self.batch_size)]
 
     def target_batches(self):
         """ Returns the target batches of the RankingTask in a list of line torch.Tensors of type torch.long. """
 
-        idxs = arange(self.batch_size, len(self.labels), self.batch_size)
-        target_batches = [torch.tensor(labels, dtype=torch.long) for labels in split(asarray(self.labels), idxs)]
-
-        return target_batches
+        return [torch.tensor(self.labels[i:i + self.batch_size], dtype=torch.long)
+                for i in range(0, len(self.labels), self.batch_size)]
 
     # endregion
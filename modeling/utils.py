@@ -1,7 +1,209 @@
-from numpy import mean, std
+from numpy import asarray, float32, mean, std
+from hashlib import blake2b
+from itertools import chain
+from queue import Queue, Empty
+from threading import Thread, Event
+from torch.utils.data import Dataset
+from tqdm.auto import tqdm
 import torch
 
 
+class EvaluationDataset(Dataset):
+    """ Dataset applying an evaluation function to the rankings of a data_loader when accessed, so that the rankings
+    can be evaluated in the workers of a torch.utils.data.DataLoader. """
+
+    def __init__(self, data_loader, evaluate):
+        """
+        Initializes an instance of EvaluationDataset.
+
+        Args:
+            data_loader: list, list of ranking tasks, which are lists of (inputs, targets) batches.
+            evaluate: function, evaluation of a ranking task.
+        """
+
+        self.data_loader = data_loader
+        self.evaluate = evaluate
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def __getitem__(self, idx):
+        return self.evaluate(self.data_loader[idx])
+
+
+class Prefetcher:
+    """ Iterator applying a function to the items of an iterable in a background thread, a few items ahead of the
+    consumer, so that the function's work overlaps with the processing of the previous items. It should be used as a
+    context manager (or closed), so that its thread stops even if the consumer doesn't reach the end. """
+
+    def __init__(self, iterable, function, size=2):
+        """
+        Initializes an instance of Prefetcher and starts its background thread.
+
+        Args:
+            iterable: iterable, items to process.
+            function: function, processing of an item.
+            size: int, maximum number of processed items waiting to be consumed.
+        """
+
+        self.queue = Queue(maxsize=size)
+        self.end = object()
+        self.exception = None
+        self.stop = Event()
+        self.done = False
+
+        self.thread = Thread(target=self.fill, args=(iterable, function), daemon=True)
+        self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __next__(self):
+        # once the end marker is consumed (or the thread is stopped), nothing else is put in the queue
+        if self.done:
+            raise StopIteration
+
+        item = self.queue.get()
+
+        if item is self.end:
+            self.done = True
+
+            if self.exception is not None:
+                raise self.exception
+
+            raise StopIteration
+
+        return item
+
+    def fill(self, iterable, function):
+        """ Puts the processed items of iterable in the queue, then the end marker. """
+
+        try:
+            for item in iterable:
+                if self.stop.is_set():
+                    return
+
+                self.queue.put(function(item))
+
+        except Exception as exception:
+            self.exception = exception
+
+        if not self.stop.is_set():
+            self.queue.put(self.end)
+
+    def close(self):
+        """ Stops the background thread, emptying the queue so that it is not blocked on it, and waits for it. """
+
+        self.stop.set()
+        self.done = True
+
+        while self.thread.is_alive():
+            self.drain()
+            self.thread.join(timeout=0.1)
+
+        self.drain()
+
+    def drain(self):
+        """ Removes the items waiting in the queue. """
+
+        try:
+            while True:
+                self.queue.get_nowait()
+
+        except Empty:
+            pass
+
+
+class Lemmas(dict):
+    """ Dictionary mapping words to their lemma, computed with the lemmatizer the first time a word is looked up. """
+
+    def __init__(self, lemmatizer):
+        """
+        Initializes an instance of Lemmas.
+
+        Args:
+            lemmatizer: nltk.stem.WordNetLemmatizer, lemmatizer to use for the unseen words.
+        """
+
+        super().__init__()
+
+        self.lemmatizer = lemmatizer
+
+    def __missing__(self, word):
+        lemma = self[word] = self.lemmatizer.lemmatize(word)
+        return lemma
+
+
+class BpeCodes(dict):
+    """ Dictionary mapping sentences to their BPE codes (as a str), computed with BART's BPE the first time a sentence
+    is encoded. """
+
+    def __init__(self, bpe):
+        """
+        Initializes an instance of BpeCodes.
+
+        Args:
+            bpe: fairseq.data.encoders.gpt2_bpe.GPT2BPE, BPE to use for the unseen sentences.
+        """
+
+        super().__init__()
+
+        self.bpe = bpe
+
+    def __missing__(self, sentence):
+        codes = self[sentence] = self.bpe.encode(sentence)
+        return codes
+
+
+class EmbeddingIdxs(dict):
+    """ Dictionary mapping words to their row in the vectors of a pretrained embedding (None if unknown), looked up in
+    the embedding's vocabulary the first time a word is encountered. """
+
+    def __init__(self, embedding):
+        """
+        Initializes an instance of EmbeddingIdxs.
+
+        Args:
+            embedding: gensim.models.KeyedVectors, pretrained embedding.
+        """
+
+        super().__init__()
+
+        self.embedding = embedding
+
+    def __missing__(self, word):
+        if hasattr(self.embedding, 'key_to_index'):  # gensim >= 4
+            idx = self.embedding.key_to_index.get(word)
+        else:
+            vocab = self.embedding.vocab
+            idx = vocab[word].index if word in vocab else None
+
+        self[word] = idx
+        return idx
+
+
+def progress_bar(iterable, total):
+    """
+    Returns a progress bar over iterable which is refreshed at most every half second and 200 times overall, so that
+    its display doesn't slow down fast loops.
+
+    Args:
+        iterable: iterable, items to iterate over.
+        total: int, number of items of iterable.
+
+    Returns:
+        tqdm.auto.tqdm, progress bar.
+    """
+
+    return tqdm(iterable, total=total, mininterval=0.5, miniters=max(1, total // 200))
+
+
 def get_ranks(outputs):
     """
     Returns the ranks according to the outputs (1 for highest grade). Deal with draws by assigning the best rank to the
@@ -19,11 +221,86 @@ def get_ranks(outputs):
     n = len(grades)
 
     sorter = torch.argsort(grades, descending=True)
-    ranks = torch.zeros(n, dtype=torch.long)
 
-    ranks[sorter] = torch.arange(1, n + 1)
+    return torch.empty(n, dtype=torch.long).scatter_(0, sorter, torch.arange(1, n + 1))
+
+
+def get_words(s, remove_stopwords, remove_punctuation, lower, lemmatize, stopwords, lemmas, punctuation_table):
+    """
+    Returns the words from the string s in a list, with various preprocessing.
+
+    Args:
+        s: str, words to deal with.
+        remove_stopwords: bool, whether to remove the stopwords or not.
+        remove_punctuation: bool, whether to remove the punctuation or not.
+        lower: bool, whether to remove the capitals or not.
+        lemmatize: bool, whether or not to lemmatize the words or not.
+        stopwords: frozenset, stopwords to remove (in lower case).
+        lemmas: Lemmas, lemmas of the words.
+        punctuation_table: dict, translation table removing the punctuation.
+
+    Returns:
+        list, preprocessed words of the string.
+    """
+
+    if remove_punctuation:
+        s = s.translate(punctuation_table)
+
+    # the words are lemmatized before being lowered (the lemmatizer is case sensitive), so the string can only be
+    # lowered at once when there is no lemmatization
+    lower_string = lower and not lemmatize
+
+    if lower_string:
+        s = s.lower()
+
+    words = s.split()
+
+    if remove_stopwords:
+        if lower_string:
+            words = [word for word in words if word not in stopwords]
+        else:
+            words = [word for word in words if word.lower() not in stopwords]
+
+    if lemmatize:
+        words = [lemmas[word] for word in words]
+
+        if lower:
+            words = [word.lower() for word in words]
+
+    return words
+
+
+def to_column_tensor(values):
+    """
+    Returns the values as a float column Tensor, built from a numpy array to avoid converting each element separately.
+
+    Args:
+        values: list, numbers to convert.
+
+    Returns:
+        torch.Tensor, values in a column Tensor of type torch.float.
+    """
+
+    return torch.from_numpy(asarray(values, dtype=float32)).unsqueeze_(1)
+
+
+def words_key(words):
+    """
+    Returns a short hash of words, to use as a cache key.
+
+    Args:
+        words: list or set, words to hash.
+
+    Returns:
+        bytes, hash of the words.
+    """
+
+    if isinstance(words, set):
+        s = "set " + " ".join(sorted(words))
+    else:
+        s = "list " + " ".join(words)
 
-    return ranks
+    return blake2b(s.encode(), digest_size=16).digest()
 
 
 def format_context(ranking_or_inputs, context_format, context_max_size):
@@ -46,9 +323,7 @@ def format_context(ranking_or_inputs, context_format, context_max_size):
     context_items = []
 
     if context_format == "v0":  # (no separation token) wikis articles entities
-        for wiki_article in inputs['wiki_articles']:
-            if wiki_article:
-                context_items.append(wiki_article)
+        context_items.extend(filter(None, inputs['wiki_articles']))
 
         for nyt_title, nyt_context in zip(inputs['nyt_titles'], inputs['nyt_contexts']):
             context_items.extend([nyt_title + ':', nyt_context])
@@ -77,9 +352,8 @@ def format_context(ranking_or_inputs, context_format, context_max_size):
             article_sep = "A"
             entity_sep = "E"
 
-        for wiki_article in inputs['wiki_articles']:
-            if wiki_article:
-                context_items.extend([wiki_sep, wiki_article])
+        context_items.extend(chain.from_iterable((wiki_sep, wiki_article)
+                                                 for wiki_article in filter(None, inputs['wiki_articles'])))
 
         for nyt_title, nyt_context in zip(inputs['nyt_titles'], inputs['nyt_contexts']):
             context_items.extend([article_sep, nyt_title + ".", nyt_context])
@@ -95,9 +369,7 @@ def format_context(ranking_or_inputs, context_format, context_max_size):
             context_items.append(', '.join(inputs['entities']))
 
         elif context_format == "vb":  # no article
-            for wiki_article in inputs['wiki_articles']:
-                if wiki_article:
-                    context_items.append(wiki_article)
+            context_items.extend(filter(None, inputs['wiki_articles']))
 
             context_items.append(', '.join(inputs['entities']))
 
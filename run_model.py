@@ -9,7 +9,6 @@ Usages:
 
 from toolbox.parsers import standard_parser, add_task_arguments, add_model_arguments
 from toolbox.utils import load_task, get_pretrained_model, to_class_name
-import modeling.models as models
 
 
 def parse_arguments():
@@ -27,6 +26,8 @@ def main():
 
     args = parse_arguments()
 
+    import modeling.models as models  # heavy import, done once the arguments are parsed
+
     task = load_task(args)
     pretrained_model = get_pretrained_model(args)
 
@@ -11,13 +11,16 @@ ANNOTATION_TASK_SHORT_SIZE = 10000
 
 LOAD_WIKI = True
 WIKIPEDIA_FILE_NAME = "wikipedia_global"
+WIKIPEDIA_WORKERS = 2
 CORRECT_WIKI = True
+CORRECT_WIKI_STEPS = ()
 # endregion
 
 # region Modeling task parameters
 MIN_ASSIGNMENTS = 5
 MIN_ANSWERS = 2
 K_CROSS_VALIDATION = 5
+MODELING_TASK_SHORT_SIZE = 10
 
 VALID_PROPORTION = 0.25
 TEST_PROPORTION = 0.25
@@ -38,6 +41,7 @@ SCORES_NAMES = [
 ]
 
 TASK_NAME = "context-dependent-same-type"
+NUM_WORKERS = 0
 CONTEXT_MAX_SIZE = 750
 SHOW_RANKINGS = 5
 SHOW_CHOICES = 10
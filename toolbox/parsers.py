@@ -91,6 +91,12 @@ def add_task_arguments(ap):
     ap.add_argument("--k_cross_validation",
                     type=int, default=K_CROSS_VALIDATION,
                     help="Number of folds for cross validation.")
+    ap.add_argument("--short",
+                    action='store_true',
+                    help="Short task option (use only the first ranking tasks of each data loader).")
+    ap.add_argument("--short_size",
+                    type=int, default=MODELING_TASK_SHORT_SIZE,
+                    help="Number of ranking tasks of each data loader (of each fold) in the short task.")
     ap.add_argument("--generation",
                     action='store_true',
                     help="Generation finetuning option.")
@@ -128,6 +134,9 @@ def add_model_arguments(ap):
     ap.add_argument("--model_random_seed",
                     type=int, default=RANDOM_SEED,
                     help="Random seed of the model.")
+    ap.add_argument("--num_workers",
+                    type=int, default=NUM_WORKERS,
+                    help="Number of worker processes evaluating the rankings (0 to evaluate in the main process).")
     ap.add_argument("--show_rankings",
                     type=int, default=SHOW_RANKINGS,
                     help="Number of rankings to show.")
@@ -158,6 +167,12 @@ def add_model_arguments(ap):
     ap.add_argument("--tensorboard",
                     action="store_true",
                     help="Option to use tensorboard.")
+    ap.add_argument("--cache",
+                    action="store_true",
+                    help="Option to load and save the preprocessed words and average embeddings of the baselines.")
+    ap.add_argument("--cache_path",
+                    type=str, default=CACHE_PATH,
+                    help="Path of the cache folder.")
     ap.add_argument("--show",
                     action="store_true",
                     help="Option to show some examples instead of ranking.")
@@ -10,5 +10,6 @@ ANNOTATION_TASK_RESULTS_PATH = "results/annotation_task/"
 MODELING_TASK_RESULTS_PATH = "results/modeling_task/"
 BASELINES_RESULTS_PATH = 'results/baselines/'
 TENSORBOARD_LOGS_PATH = "results/baselines/tensorboard_logs/"
+CACHE_PATH = "results/baselines/cache/"
 FINETUNING_DATA_PATH = "results/finetuning_data/"
 # endregion
@@ -1,17 +1,21 @@
-from pickle import load
-from os.path import join as path_join
-import torch
+from pickle import loads
+from os.path import join as path_join, abspath, exists, isfile, getmtime, getsize
+from functools import lru_cache
+from hashlib import sha1
 
 
+@lru_cache(maxsize=None)
 def to_class_name(name):
-    """ For a name of the format 'abc_efg', returns the corresponding Class name, of the format 'AbcEfg'. """
+    """ For a name of the format 'abc-efg', returns the corresponding Class name, of the format 'AbcEfg'. """
 
-    return "".join([word.capitalize() for word in name.split("-")])
+    return name.replace("-", " ").title().replace(" ", "")
 
 
 def load_task(args):
     """
-    Load a Task using pickle, depending on the arguments passed in args.
+    Load a Task using pickle, depending on the arguments passed in args. Its data loaders are loaded from their own
+    files when they are first accessed (tasks saved as a single file are loaded entirely); with the short option, the
+    short data loaders saved next to them are used instead.
 
     Args:
         args: argparse.ArgumentParser, arguments passed to the script.
@@ -30,24 +34,34 @@ def load_task(args):
     root = args.root
     folder_path = args.task_path
     cross_validation = args.cross_validation
+    short = args.short
 
-    train_proportion = ("%.2f" % (1 - valid_proportion - test_proportion)).split(".")[1]
-    valid_proportion = ("%.2f" % valid_proportion).split(".")[1]
-    test_proportion = ("%.2f" % test_proportion).split(".")[1]
-
-    suffix = "_" + "-".join([train_proportion, valid_proportion, test_proportion])
-    suffix += "_rs" + str(ranking_size) if ranking_size is not None else ""
-    suffix += "_bs" + str(batch_size)
+    # proportions as two digits percentages (the digits after the decimal point)
+    suffix = "_%02d-%02d-%02d" % tuple(round(100 * proportion) % 100 for proportion in
+                                       (1 - valid_proportion - test_proportion, valid_proportion, test_proportion))
+    suffix += "_rs%i" % ranking_size if ranking_size is not None else ""
+    suffix += "_bs%i" % batch_size
     suffix += "_cf-" + context_format if context_format is not None else ""
     suffix += "_tf-" + targets_format if targets_format is not None else ""
     suffix += "_cv" if cross_validation else ""
 
     file_name = path_join(root, folder_path, task_name + suffix + '.pkl')
 
+    if not isfile(file_name):
+        raise Exception("No task file %s (check the task options or create the task first)." % file_name)
+
     with open(file_name, 'rb') as file:
-        task = load(file)
+        task = loads(file.read())
+
+    if short and not all(isfile(task.loader_file_name(file_name, data_loader_name, short=True))
+                         for data_loader_name in task.data_loader_names):
+        raise Exception("No short data loaders next to %s (tasks saved as a single file have none, load it without "
+                        "the short option)." % file_name)
+
+    task.file_name = file_name
+    task.short = short
 
-    print("Task loaded from %s.\n" % file_name)
+    print("Task loaded from %s%s.\n" % (file_name, " (short data loaders)" if short else ""))
 
     return task
 
@@ -76,9 +90,19 @@ def get_pretrained_model(args):
         raise Exception("Must chose between word2vec and BART.")
 
 
+def file_key(fname):
+    """ Returns a key identifying the version of the file fname, computed from its name, modification time and size. """
+
+    fname = abspath(fname)
+
+    return sha1(("%s %f %i" % (fname, getmtime(fname), getsize(fname))).encode()).hexdigest()
+
+
+@lru_cache(maxsize=4)
 def get_word2vec(folder_path):
     """
-    Returns the word2vec embedding.
+    Returns the word2vec embedding. The binary file is converted once into gensim's native format (with the key of the
+    binary file stored next to it), which is then memory-mapped; the embedding is also cached for repeated calls.
 
     Args:
         folder_path: str, path to the pretrained models.
@@ -87,9 +111,30 @@ def get_word2vec(folder_path):
     from gensim.models import KeyedVectors
 
     fname = path_join(folder_path, "GoogleNews-vectors-negative300.bin")
-    word2vec = KeyedVectors.load_word2vec_format(fname=fname, binary=True)
+    kv_fname = path_join(folder_path, "GoogleNews-vectors-negative300.kv")
+    key_fname = kv_fname + ".key"
+
+    key = file_key(fname) if exists(fname) else None
+
+    if key is not None:
+        stored_key = None
+        if exists(kv_fname) and exists(key_fname):
+            with open(key_fname, 'r') as file:
+                stored_key = file.read().strip()
+
+        if stored_key != key:
+            word2vec = KeyedVectors.load_word2vec_format(fname=fname, binary=True)
+            word2vec.save(kv_fname)
+
+            with open(key_fname, 'w') as file:
+                file.write(key)
+
+            print("Word2Vec embedding converted to %s." % kv_fname)
+
+    word2vec = KeyedVectors.load(kv_fname, mmap='r')
+    word2vec.file_key = key if key is not None else file_key(kv_fname)  # version of the embedding, for the caches
 
-    print("Word2Vec embedding loaded.\n")
+    print("Word2Vec embedding loaded (memory-mapped).\n")
 
     return word2vec
 
@@ -104,6 +149,7 @@ def get_bart(folder_path, checkpoint_file):
     """
 
     from fairseq.models.bart import BARTModel
+    import torch
 
     bart = BARTModel.from_pretrained(model_name_or_path=folder_path + '/',
                                      checkpoint_file=checkpoint_file)